@@ -3,21 +3,95 @@ from datetime import datetime, timedelta
 from InquirerPy import prompt
 import time
 from colorama import Fore, Style, init
-import matplotlib.pyplot as plt
-from collections import defaultdict
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from collections import defaultdict, Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 from pync import Notifier
 import json
 import csv
 import threading
+import os
+import argparse
+import hashlib
+import uuid
+import heapq
+from functools import lru_cache
 
 DB_FILE = 'tasks.db'
+SHARDS_FILE = 'shards.json'
+DEFAULT_TEAM = 'default'
+SEARCH_LIMIT = 50
+AGENDA_DAYS = 7
+PICKER_PAGE_SIZE = 20
+CHART_CACHE_DIR = 'chart_cache'
+GRAPH_RANGES = {
+    'Today': 'today',
+    'This Week': 'week',
+    'This Month': 'month',
+    'This Year': 'year',
+    'Custom Date Range': 'custom'
+}
+PRIORITY_RANK = {'High': 0, 'Medium': 1, 'Low': 2}
+# Menu items added after settings.json started being written. Settings files
+# saved before known_menu_items was tracked get these switched on once.
+NEW_MENU_ITEMS = ['Bulk edit tasks', 'View agenda']
 init(autoreset=True)
 
+_agenda_cache = {}
+Agenda = namedtuple('Agenda', ['overdue', 'today', 'upcoming'])
+_shard_pool = None
+
 def send_notification(task_name, due_time):
     Notifier.notify(f'Task "{task_name}" is due at {due_time}', title='Task Reminder')
 
+def load_shards():
+    try:
+        with open(SHARDS_FILE, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_shards(shards):
+    with open(SHARDS_FILE, 'w') as f:
+        json.dump(shards, f, indent=2)
+
+def get_shards():
+    # tasks.db stays in every read and write under the default team until it
+    # is registered under a team name, so existing tasks never go missing.
+    shards = load_shards()
+    if os.path.abspath(DB_FILE) not in [os.path.abspath(path) for path in shards.values()]:
+        shards = {DEFAULT_TEAM: DB_FILE, **shards}
+    return shards
+
+def get_db_files():
+    return list(get_shards().values())
+
+def select_db_file(message='Select team:'):
+    shards = get_shards()
+    if len(shards) == 1:
+        return next(iter(shards.values()))
+    team = prompt([{'type': 'list', 'name': 'team', 'message': message, 'choices': sorted(shards)}])['team']
+    return shards[team]
+
+def fan_out(func, *args):
+    db_files = get_db_files()
+    if len(db_files) == 1:
+        return [func(db_files[0], *args)]
+
+    global _shard_pool
+    if _shard_pool is None:
+        _shard_pool = ProcessPoolExecutor(max_workers=min(len(db_files), os.cpu_count() or 1))
+    futures = [_shard_pool.submit(func, db_file, *args) for db_file in db_files]
+    return [future.result() for future in futures]
+
 def init_db():
-    conn = sqlite3.connect(DB_FILE)
+    for db_file in get_db_files():
+        init_db_file(db_file)
+
+def init_db_file(db_file):
+    conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS tasks (
@@ -31,26 +105,78 @@ def init_db():
             completed INTEGER NOT NULL DEFAULT 0,
             repeatable INTEGER NOT NULL DEFAULT 0,
             repeat_interval TEXT,
-            completed_dates TEXT
+            completed_dates TEXT,
+            external_id TEXT
         )
     ''')
+    cursor.execute('PRAGMA table_info(tasks)')
+    if 'external_id' not in [column[1] for column in cursor.fetchall()]:
+        cursor.execute('ALTER TABLE tasks ADD COLUMN external_id TEXT')
+    cursor.execute('SELECT id, name, due_date, due_time FROM tasks WHERE external_id IS NULL ORDER BY id')
+    missing_ids = cursor.fetchall()
+    if missing_ids:
+        # Backfill with the same key an ID-less feed derives, so the first
+        # sync after upgrading matches existing tasks instead of copying them.
+        cursor.execute('SELECT external_id FROM tasks WHERE external_id IS NOT NULL')
+        used_ids = {row[0] for row in cursor.fetchall()}
+        assigned_ids = []
+        for task_id, name, due_date, due_time in missing_ids:
+            external_id = derive_external_id(name, due_date, due_time)
+            if external_id in used_ids:
+                # Existing duplicates: the oldest row keeps the feed key.
+                external_id = f"{external_id}-{task_id}"
+            used_ids.add(external_id)
+            assigned_ids.append((external_id, task_id))
+        cursor.executemany('UPDATE tasks SET external_id = ? WHERE id = ?', assigned_ids)
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_tasks_external_id ON tasks (external_id)')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_tasks_pending_due
+        ON tasks (due_date, due_time) WHERE completed = 0
+    ''')
+    # data_version is bumped once per write transaction (see bump_data_version)
+    # so readers in any process can tell whether cached results are current.
+    cursor.execute('CREATE TABLE IF NOT EXISTS task_meta (data_version INTEGER NOT NULL)')
+    cursor.execute('INSERT INTO task_meta (data_version) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM task_meta)')
+    # Older databases bumped the version from per-row triggers, which doubled
+    # the cost of set-based writes.
+    for event in ('insert', 'update', 'delete'):
+        cursor.execute(f'DROP TRIGGER IF EXISTS tasks_version_{event}')
     conn.commit()
     conn.close()
 
+def get_data_version(cursor):
+    cursor.execute('SELECT data_version FROM task_meta')
+    return cursor.fetchone()[0]
+
+def bump_data_version(cursor):
+    cursor.execute('UPDATE task_meta SET data_version = data_version + 1')
+
+def get_data_versions():
+    versions = []
+    for db_file in get_db_files():
+        conn = sqlite3.connect(db_file)
+        try:
+            versions.append(get_data_version(conn.cursor()))
+        finally:
+            conn.close()
+    return tuple(versions)
+
 def check_upcoming_tasks():
     while True:
         try:
-            conn = sqlite3.connect(DB_FILE)
-            cursor = conn.cursor()
             current_time = datetime.now()
             reminder_time = current_time + timedelta(minutes=30)
-            cursor.execute('''
-                SELECT name, due_date, due_time
-                FROM tasks
-                WHERE completed = 0 AND datetime(due_date || " " || due_time) BETWEEN ? AND ?
-            ''', (current_time.strftime("%Y-%m-%d %H:%M"), reminder_time.strftime("%Y-%m-%d %H:%M")))
-            upcoming_tasks = cursor.fetchall()
-            conn.close()
+            upcoming_tasks = []
+            for db_file in get_db_files():
+                conn = sqlite3.connect(db_file)
+                cursor = conn.cursor()
+                cursor.execute('''
+                    SELECT name, due_date, due_time
+                    FROM tasks
+                    WHERE completed = 0 AND datetime(due_date || " " || due_time) BETWEEN ? AND ?
+                ''', (current_time.strftime("%Y-%m-%d %H:%M"), reminder_time.strftime("%Y-%m-%d %H:%M")))
+                upcoming_tasks.extend(cursor.fetchall())
+                conn.close()
 
             for task in upcoming_tasks:
                 task_name = task[0]
@@ -85,8 +211,9 @@ def validate_time(hour, minute, period, date):
 def add_task():
     current_datetime = datetime.now()
     current_date = current_datetime.strftime("%Y-%m-%d")
+    db_file = select_db_file('Select team for the new task:')
 
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
     cursor.execute('SELECT DISTINCT tags FROM tasks')
     all_tags = set()
@@ -148,37 +275,107 @@ def add_task():
     tags = ",".join(selected_tags) if selected_tags else ""
 
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = sqlite3.connect(db_file)
         cursor = conn.cursor()
         cursor.execute('''
-            INSERT INTO tasks (name, description, due_date, due_time, priority, tags, repeatable, repeat_interval, completed_dates)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (answers['name'], answers['description'], answers['due_date'], due_time, answers['priority'], tags, int(answers['repeatable']), answers.get('repeat_interval', None), ""))
+            INSERT INTO tasks (name, description, due_date, due_time, priority, tags, repeatable, repeat_interval, completed_dates, external_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (answers['name'], answers['description'], answers['due_date'], due_time, answers['priority'], tags, int(answers['repeatable']), answers.get('repeat_interval', None), "", uuid.uuid4().hex))
+        bump_data_version(cursor)
         conn.commit()
         conn.close()
         print(f'Task "{answers["name"]}" added.')
     except sqlite3.Error as e:
         print(f"An error occurred: {e}")
 
-def complete_task():
+def has_pending_tasks(db_file):
+    conn = sqlite3.connect(db_file)
     try:
-        conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
-        cursor.execute('SELECT id, name FROM tasks WHERE completed = 0')
-        tasks = cursor.fetchall()
+        cursor.execute('SELECT 1 FROM tasks WHERE completed = 0 LIMIT 1')
+        return cursor.fetchone() is not None
+    finally:
         conn.close()
+
+def fetch_pending_page(db_file, text, after_id=0, limit=PICKER_PAGE_SIZE):
+    conn = sqlite3.connect(db_file)
+    try:
+        cursor = conn.cursor()
+        # Keyset pagination on the primary key: the scan stops as soon as
+        # limit + 1 matches are found, however many tasks are pending.
+        cursor.execute('''
+            SELECT id, name FROM tasks
+            WHERE completed = 0 AND id > ? AND name LIKE ?
+            ORDER BY id
+            LIMIT ?
+        ''', (after_id, f"%{text}%", limit + 1))
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+    return rows[:limit], len(rows) > limit
+
+def pick_pending_tasks(db_file, message, multiselect=False):
+    def ask_filter():
+        return prompt([{'type': 'input', 'name': 'text', 'message': 'Filter tasks by name (leave blank for all):'}])['text']
+
+    selected = []
+    text = ask_filter()
+    after_id = 0
+    while True:
+        try:
+            page, has_more = fetch_pending_page(db_file, text, after_id)
+        except sqlite3.Error as e:
+            print(f"An error occurred: {e}")
+            return selected if multiselect else None
+
+        if not page and after_id == 0:
+            print("No pending tasks match that filter.")
+            if not prompt([{'type': 'confirm', 'name': 'retry', 'message': 'Try another filter?', 'default': True}])['retry']:
+                return selected if multiselect else None
+            text = ask_filter()
+            continue
+
+        choices = [{'name': f"{task[0]}: {task[1]}", 'value': task[0], 'enabled': task[0] in selected} for task in page]
+        if has_more:
+            choices.append({'name': 'More matches...', 'value': 'more'})
+        choices.append({'name': 'Change filter...', 'value': 'refine'})
+        if multiselect:
+            answer = prompt([{'type': 'checkbox', 'name': 'tasks', 'message': message, 'choices': choices}])['tasks']
+            # The page shows earlier picks as checked, so its answer replaces
+            # whatever was selected on this page before.
+            page_ids = {task[0] for task in page}
+            selected = [task_id for task_id in selected if task_id not in page_ids]
+            selected.extend(value for value in answer if isinstance(value, int))
+            if 'more' in answer:
+                after_id = page[-1][0]
+            elif 'refine' in answer:
+                text = ask_filter()
+                after_id = 0
+            else:
+                return selected
+        else:
+            answer = prompt([{'type': 'list', 'name': 'task', 'message': message, 'choices': choices}])['task']
+            if answer == 'more':
+                after_id = page[-1][0]
+            elif answer == 'refine':
+                text = ask_filter()
+                after_id = 0
+            else:
+                return answer
+
+def complete_task():
+    db_file = select_db_file()
+    try:
+        pending = has_pending_tasks(db_file)
     except sqlite3.Error as e:
         print(f"An error occurred: {e}")
         return
 
-    if not tasks:
+    if not pending:
         print("No tasks to complete.")
         return
 
-    task_choices = [{'name': task[1], 'value': task[0]} for task in tasks]
-    questions = [{'type': 'checkbox', 'name': 'tasks', 'message': 'Select tasks to complete:', 'choices': task_choices}]
-    answers = prompt(questions)
-    selected_task_ids = answers['tasks']
+    selected_task_ids = pick_pending_tasks(db_file, 'Select tasks to complete:', multiselect=True)
 
     if not selected_task_ids:
         print("No tasks selected.")
@@ -187,7 +384,7 @@ def complete_task():
     completion_datetime = datetime.now().strftime("%Y-%m-%d %I:%M %p")
 
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = sqlite3.connect(db_file)
         cursor = conn.cursor()
         
         for task_id in selected_task_ids:
@@ -213,28 +410,61 @@ def complete_task():
                     next_due_date += timedelta(days=7)
                 next_due_date_str = next_due_date.strftime("%Y-%m-%d")
                 cursor.execute('''
-                    INSERT INTO tasks (name, description, due_date, due_time, priority, tags, repeatable, repeat_interval, completed_dates)
-                    SELECT name, description, ?, due_time, priority, tags, repeatable, repeat_interval, ""
+                    INSERT INTO tasks (name, description, due_date, due_time, priority, tags, repeatable, repeat_interval, completed_dates, external_id)
+                    SELECT name, description, ?, due_time, priority, tags, repeatable, repeat_interval, "", lower(hex(randomblob(16)))
                     FROM tasks WHERE id = ?
                 ''', (next_due_date_str, task_id))
 
+        bump_data_version(cursor)
         conn.commit()
         conn.close()
         print("Selected tasks completed.")
     except sqlite3.Error as e:
         print(f"An error occurred: {e}")
 
-def list_tasks():
+def load_tags(db_file):
+    conn = sqlite3.connect(db_file)
     try:
-        conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
-
         cursor.execute('SELECT DISTINCT tags FROM tasks')
         all_tags = set()
         for row in cursor.fetchall():
-            all_tags.update(filter(None, row[0].split(',')))
+            all_tags.update(filter(None, (row[0] or '').split(',')))
+        return all_tags
+    finally:
+        conn.close()
 
-        all_tags = list(all_tags)
+def list_rows(db_file, filter_priority, filter_tags):
+    query = 'SELECT name, due_date, due_time, priority, tags FROM tasks WHERE completed = 0'
+    params = []
+
+    if filter_priority:
+        query += ' AND priority = ?'
+        params.append(filter_priority)
+    if filter_tags:
+        tag_conditions = []
+        for tag in filter_tags:
+            if tag == "No tags":
+                tag_conditions.append('tags IS NULL OR tags = ""')
+            else:
+                tag_conditions.append('tags LIKE ?')
+                params.append(f"%{tag}%")
+        query += ' AND (' + ' OR '.join(tag_conditions) + ')'
+
+    conn = sqlite3.connect(db_file)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(query, params)
+        pending_tasks = cursor.fetchall()
+        cursor.execute('SELECT name, completed_dates FROM tasks WHERE completed = 1')
+        completed_tasks = cursor.fetchall()
+    finally:
+        conn.close()
+    return pending_tasks, completed_tasks
+
+def list_tasks():
+    try:
+        all_tags = list(set().union(*fan_out(load_tags)))
         if not all_tags:
             all_tags.append("No tags")
 
@@ -246,32 +476,14 @@ def list_tasks():
         filter_priority = answers['filter_priority'] if answers['filter_priority'] != 'All' else None
         filter_tags = answers['filter_tags']
 
-        query = 'SELECT name, due_date, due_time, priority, tags FROM tasks WHERE completed = 0'
-        params = []
-
-        if filter_priority:
-            query += ' AND priority = ?'
-            params.append(filter_priority)
-        if filter_tags:
-            tag_conditions = []
-            for tag in filter_tags:
-                if tag == "No tags":
-                    tag_conditions.append('tags IS NULL OR tags = ""')
-                else:
-                    tag_conditions.append('tags LIKE ?')
-                    params.append(f"%{tag}%")
-            query += ' AND (' + ' OR '.join(tag_conditions) + ')'
-
-        cursor.execute(query, params)
-        pending_tasks = cursor.fetchall()
-
-        cursor.execute('SELECT name, completed_dates FROM tasks WHERE completed = 1')
-        completed_tasks = cursor.fetchall()
-        conn.close()
+        partials = fan_out(list_rows, filter_priority, filter_tags)
     except sqlite3.Error as e:
         print(f"An error occurred: {e}")
         return
 
+    pending_tasks = [task for pending, _ in partials for task in pending]
+    completed_tasks = [task for _, completed in partials for task in completed]
+
     def get_color(priority):
         if priority == 'High':
             return Fore.RED
@@ -292,43 +504,57 @@ def list_tasks():
         completed_dates_str = task[1]
         print(f" - {task[0]} (Completed on: {completed_dates_str})")
 
-def stats():
+def stats_partial(db_file):
+    conn = sqlite3.connect(db_file)
     try:
-        conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
         cursor.execute('SELECT COUNT(*) FROM tasks')
         total_tasks = cursor.fetchone()[0]
         cursor.execute('SELECT COUNT(*) FROM tasks WHERE completed = 1')
         completed_tasks = cursor.fetchone()[0]
-
-        print(f'Total tasks: {total_tasks}')
-        print(f'Completed tasks: {completed_tasks}')
-
         cursor.execute('SELECT name, due_date, due_time, completed_dates FROM tasks WHERE completed = 1')
         completed_tasks_data = cursor.fetchall()
+    finally:
         conn.close()
-    except sqlite3.Error as e:
-        print(f"An error occurred: {e}")
-        return
 
-    late_tasks_count = 0
-    current_datetime = datetime.now()
+    late_tasks = []
     for task in completed_tasks_data:
         due_datetime = datetime.strptime(f"{task[1]} {task[2]}", "%Y-%m-%d %H:%M")
-        completed_dates = task[3].split(', ')
+        completed_dates = (task[3] or '').split(', ')
         for completion_date in completed_dates:
-            completion_datetime = datetime.strptime(completion_date, "%Y-%m-%d %I:%M %p")
+            if not completion_date.strip():
+                continue
+            completion_datetime = datetime.strptime(completion_date.strip(), "%Y-%m-%d %I:%M %p")
             if completion_datetime > due_datetime:
-                late_tasks_count += 1
-                print(f"Task '{task[0]}' was completed late. Due date was {task[1]} {task[2]}.")
+                late_tasks.append(task[:3])
                 break
+    return total_tasks, completed_tasks, late_tasks
+
+def stats():
+    try:
+        partials = fan_out(stats_partial)
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+        return
+
+    print(f'Total tasks: {sum(partial[0] for partial in partials)}')
+    print(f'Completed tasks: {sum(partial[1] for partial in partials)}')
+
+    late_tasks_count = 0
+    for _, _, late_tasks in partials:
+        for task in late_tasks:
+            late_tasks_count += 1
+            print(f"Task '{task[0]}' was completed late. Due date was {task[1]} {task[2]}.")
     print(f'Total late tasks: {late_tasks_count}')
 
 def cleanup_completed_tasks():
+    db_file = select_db_file()
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = sqlite3.connect(db_file)
         cursor = conn.cursor()
         cursor.execute('DELETE FROM tasks WHERE completed = 1')
+        if cursor.rowcount:
+            bump_data_version(cursor)
         conn.commit()
         conn.close()
         print("All completed tasks have been removed.")
@@ -342,54 +568,139 @@ def format_time(hour, minute, period):
         hour = 0
     return f"{hour:02}:{minute:02}"
 
-def generate_completion_graph():
+def load_completion_counts(db_file):
+    conn = sqlite3.connect(db_file)
     try:
-        conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
         cursor.execute('SELECT completed_dates FROM tasks WHERE completed = 1')
         completed_dates = cursor.fetchall()
+    finally:
         conn.close()
-    except sqlite3.Error as e:
-        print(f"An error occurred: {e}")
-        return
 
-    date_counts = defaultdict(int)
+    date_counts = Counter()
     for dates in completed_dates:
-        for date_str in dates[0].split(','):
-            date = datetime.strptime(date_str.strip(), "%Y-%m-%d %I:%M %p").date()
+        for date_str in (dates[0] or '').split(','):
+            if not date_str.strip():
+                continue
+            date = datetime.strptime(date_str.strip(), "%Y-%m-%d %I:%M %p")
             date_counts[date] += 1
+    return date_counts
 
-    dates = sorted(date_counts.keys())
-    counts = [date_counts[date] for date in dates]
+def get_completion_counts():
+    return sum(fan_out(load_completion_counts), Counter())
 
-    plt.figure(figsize=(12, 6))
-    plt.bar(dates, counts)
-    plt.title('Tasks Completed per Day')
-    plt.xlabel('Date')
-    plt.ylabel('Number of Tasks Completed')
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    plt.show()
+def get_graph_range(range_name, custom_start=None, custom_end=None):
+    now = datetime.now()
+
+    if range_name == 'today':
+        start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_date = start_date + timedelta(days=1)
+        label_format = "%H:00"
+        increment = timedelta(hours=1)
+        title = 'Tasks Completed Today (by hour)'
+    elif range_name == 'week':
+        start_date = now - timedelta(days=now.weekday())
+        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        end_date = start_date + timedelta(days=7)
+        label_format = "%a"
+        increment = timedelta(days=1)
+        title = 'Tasks Completed This Week'
+    elif range_name == 'month':
+        start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        end_date = (start_date + timedelta(days=32)).replace(day=1)
+        label_format = "%d"
+        increment = timedelta(days=1)
+        title = 'Tasks Completed This Month'
+    elif range_name == 'year':
+        start_date = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
+        end_date = start_date.replace(year=start_date.year + 1)
+        label_format = "%b"
+        increment = timedelta(days=30)
+        title = 'Tasks Completed This Year'
+    else:
+        start_date = datetime.strptime(custom_start, "%Y-%m-%d")
+        end_date = datetime.strptime(custom_end, "%Y-%m-%d") + timedelta(days=1)
+
+        if (end_date - start_date).days <= 7:
+            label_format = "%a"
+            increment = timedelta(days=1)
+        elif (end_date - start_date).days <= 31:
+            label_format = "%d"
+            increment = timedelta(days=1)
+        else:
+            label_format = "%b"
+            increment = timedelta(days=30)
+
+        title = f'Tasks Completed from {start_date.date()} to {end_date.date() - timedelta(days=1)}'
+
+    return start_date, end_date, label_format, increment, title
+
+def bucket_completions(date_counts, start_date, end_date, increment):
+    graph_data = []
+    current_date = start_date
+    while current_date < end_date:
+        count = sum(n for d, n in date_counts.items() if current_date <= d < current_date + increment)
+        graph_data.append((current_date, count))
+        current_date += increment
+    return graph_data
+
+def render_completion_chart(range_name, image_format='png', custom_start=None, custom_end=None):
+    start_date, end_date, label_format, increment, title = get_graph_range(range_name, custom_start, custom_end)
+
+    # The stamp covers which shard files the versions came from, so swapping
+    # a file that happens to share a data_version cannot serve a stale chart.
+    shard_key = hashlib.sha1('\0'.join(os.path.abspath(db_file) for db_file in get_db_files()).encode()).hexdigest()[:8]
+    data_version = '-'.join(str(version) for version in get_data_versions()) + f"-{shard_key}"
+    prefix = f"completions_{range_name}_{start_date:%Y%m%d}_{end_date:%Y%m%d}"
+    chart_path = os.path.join(CHART_CACHE_DIR, f"{prefix}_v{data_version}.{image_format}")
+    if os.path.exists(chart_path):
+        return chart_path
+    date_counts = get_completion_counts()
+
+    graph_data = bucket_completions(date_counts, start_date, end_date, increment)
+
+    fig = Figure(figsize=(12, 6))
+    FigureCanvasAgg(fig)
+    ax = fig.add_subplot()
+    # Bars are placed by position: labels such as "Jan" or "01" can repeat
+    # across buckets and would otherwise stack onto one slot.
+    positions = range(len(graph_data))
+    ax.bar(positions, [count for _, count in graph_data])
+    ax.set_xticks(positions)
+    ax.set_xticklabels([date.strftime(label_format) for date, _ in graph_data])
+    ax.set_title(title)
+    ax.set_xlabel('Date')
+    ax.set_ylabel('Number of Tasks Completed')
+    ax.tick_params(axis='x', labelrotation=45)
+    fig.tight_layout()
+
+    os.makedirs(CHART_CACHE_DIR, exist_ok=True)
+    # Write to a temp file and rename so a dashboard never reads a partial image.
+    tmp_path = f"{chart_path}.{os.getpid()}.tmp"
+    fig.savefig(tmp_path, format=image_format)
+    os.replace(tmp_path, chart_path)
+
+    for name in os.listdir(CHART_CACHE_DIR):
+        if name.startswith(f"{prefix}_v") and name.endswith(f".{image_format}") and os.path.join(CHART_CACHE_DIR, name) != chart_path:
+            os.remove(os.path.join(CHART_CACHE_DIR, name))
+    return chart_path
 
 def edit_task():
+    db_file = select_db_file()
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute('SELECT id, name FROM tasks WHERE completed = 0')
-        tasks = cursor.fetchall()
-        conn.close()
+        pending = has_pending_tasks(db_file)
     except sqlite3.Error as e:
         print(f"An error occurred: {e}")
         return
 
-    if not tasks:
+    if not pending:
         print("No tasks to edit.")
         return
 
-    task_choices = [f"{task[0]}: {task[1]}" for task in tasks]
-    questions = [{'type': 'list', 'name': 'task', 'message': 'Select the task to edit:', 'choices': task_choices}]
-    answer = prompt(questions)
-    task_id = int(answer['task'].split(':')[0])
+    task_id = pick_pending_tasks(db_file, 'Select the task to edit:')
+    if task_id is None:
+        print("No task selected.")
+        return
 
     edit_questions = [
         {'type': 'input', 'name': 'name', 'message': 'Enter new task name (leave blank to keep current):'},
@@ -400,7 +711,7 @@ def edit_task():
     edit_answers = prompt(edit_questions)
 
     try:
-        conn = sqlite3.connect(DB_FILE)
+        conn = sqlite3.connect(db_file)
         cursor = conn.cursor()
         
         update_fields = []
@@ -422,6 +733,7 @@ def edit_task():
             query = f"UPDATE tasks SET {', '.join(update_fields)} WHERE id = ?"
             params.append(task_id)
             cursor.execute(query, params)
+            bump_data_version(cursor)
             conn.commit()
             print("Task updated successfully.")
         else:
@@ -431,14 +743,152 @@ def edit_task():
     except sqlite3.Error as e:
         print(f"An error occurred: {e}")
 
-def view_today_tasks():
-    today = datetime.now().strftime("%Y-%m-%d")
+def build_task_filter(priority=None, tags=None, due_from=None, due_to=None, text=None):
+    conditions = ['completed = 0']
+    params = {}
+    if priority:
+        conditions.append('priority = :priority')
+        params['priority'] = priority
+    for i, tag in enumerate(tags or []):
+        conditions.append(f"(',' || tags || ',') LIKE :tag{i}")
+        params[f'tag{i}'] = f"%,{tag},%"
+    if due_from:
+        conditions.append('due_date >= :due_from')
+        params['due_from'] = due_from
+    if due_to:
+        conditions.append('due_date <= :due_to')
+        params['due_to'] = due_to
+    if text:
+        conditions.append('(name LIKE :text OR description LIKE :text)')
+        params['text'] = f"%{text}%"
+    return ' AND '.join(conditions), params
+
+def bulk_update_tasks(db_file, filters, shift_days=0, priority=None, add_tag=None, remove_tag=None, confirm=None):
+    where, params = build_task_filter(**filters)
+
+    set_fields = []
+    if shift_days:
+        set_fields.append(('due_date', 'date(due_date, :shift)'))
+        params['shift'] = f"{shift_days:+d} days"
+    if priority:
+        set_fields.append(('priority', ':new_priority'))
+        params['new_priority'] = priority
+    tags_expr = 'tags'
+    if add_tag:
+        tags_expr = f"""CASE
+            WHEN {tags_expr} IS NULL OR {tags_expr} = '' THEN :add_tag
+            WHEN (',' || {tags_expr} || ',') LIKE '%,' || :add_tag || ',%' THEN {tags_expr}
+            ELSE {tags_expr} || ',' || :add_tag
+        END"""
+        params['add_tag'] = add_tag
+    if remove_tag:
+        tags_expr = f"trim(replace(',' || ({tags_expr}) || ',', ',' || :remove_tag || ',', ','), ',')"
+        params['remove_tag'] = remove_tag
+    if tags_expr != 'tags':
+        set_fields.append(('tags', tags_expr))
+
+    # Only rows the changes would actually alter are counted and rewritten, so
+    # no-op edits neither inflate the total nor bump data_version.
+    if set_fields:
+        where += ' AND (' + ' OR '.join(f'{column} IS NOT {expr}' for column, expr in set_fields) + ')'
+
+    conn = sqlite3.connect(db_file)
+    try:
+        cursor = conn.cursor()
+        # The preview is a plain read and the update its own short transaction:
+        # no lock is held while confirm() waits on the user, so the caller
+        # reports any drift between matched and updated instead.
+        cursor.execute(f'SELECT COUNT(*) FROM tasks WHERE {where}', params)
+        matched = cursor.fetchone()[0]
+        if not set_fields or (confirm is not None and not confirm(matched)):
+            return matched, None
+        cursor.execute(f"UPDATE tasks SET {', '.join(f'{column} = {expr}' for column, expr in set_fields)} WHERE {where}", params)
+        updated = cursor.rowcount
+        if updated:
+            bump_data_version(cursor)
+        conn.commit()
+        return matched, updated
+    finally:
+        conn.close()
+
+def bulk_edit_tasks():
+    db_file = select_db_file()
+    filter_questions = [
+        {'type': 'list', 'name': 'priority', 'message': 'Filter by priority:', 'choices': ['All', 'Low', 'Medium', 'High'], 'default': 'All'},
+        {'type': 'input', 'name': 'tags', 'message': 'Filter by tags (comma separated) or leave blank:'},
+        {'type': 'input', 'name': 'due_from', 'message': 'Due on or after (YYYY-MM-DD) or leave blank:'},
+        {'type': 'input', 'name': 'due_to', 'message': 'Due on or before (YYYY-MM-DD) or leave blank:'},
+        {'type': 'input', 'name': 'text', 'message': 'Text in name or description or leave blank:'},
+    ]
+    filter_answers = prompt(filter_questions)
+    filters = {
+        'priority': filter_answers['priority'] if filter_answers['priority'] != 'All' else None,
+        'tags': [tag.strip() for tag in filter_answers['tags'].split(',') if tag.strip()],
+        'due_from': filter_answers['due_from'] or None,
+        'due_to': filter_answers['due_to'] or None,
+        'text': filter_answers['text'] or None,
+    }
+    for date_text in (filters['due_from'], filters['due_to']):
+        if date_text:
+            try:
+                datetime.strptime(date_text, "%Y-%m-%d")
+            except ValueError:
+                print("Invalid date format. Please use YYYY-MM-DD.")
+                return
+
+    change_questions = [
+        {'type': 'input', 'name': 'shift_days', 'message': 'Shift due dates by N days (e.g. 7 or -2) or leave blank:'},
+        {'type': 'list', 'name': 'priority', 'message': 'Set priority:', 'choices': ['Keep current', 'Low', 'Medium', 'High']},
+        {'type': 'input', 'name': 'add_tag', 'message': 'Tag to add or leave blank:'},
+        {'type': 'input', 'name': 'remove_tag', 'message': 'Tag to remove or leave blank:'},
+    ]
+    change_answers = prompt(change_questions)
+    try:
+        shift_days = int(change_answers['shift_days']) if change_answers['shift_days'] else 0
+    except ValueError:
+        print("Invalid day shift. Please enter a whole number.")
+        return
+    changes = {
+        'shift_days': shift_days,
+        'priority': change_answers['priority'] if change_answers['priority'] != 'Keep current' else None,
+        'add_tag': change_answers['add_tag'].strip() or None,
+        'remove_tag': change_answers['remove_tag'].strip() or None,
+    }
+    if not any(changes.values()):
+        print("No changes were specified.")
+        return
+
+    try:
+        def confirm(matched):
+            if not matched:
+                return False
+            return prompt([{'type': 'confirm', 'name': 'apply', 'message': f'{matched} tasks would change. Apply changes?', 'default': False}])['apply']
+
+        matched, updated = bulk_update_tasks(db_file, filters, confirm=confirm, **changes)
+        if not matched:
+            print("No tasks would be changed by this edit.")
+        elif updated is None:
+            print("Dry run only. No tasks were changed.")
+        else:
+            print(f"{updated} tasks updated.")
+            if updated != matched:
+                print(f"Note: {matched} tasks were confirmed but {updated} were updated; tasks changed while you were confirming.")
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+
+def today_rows(db_file, today):
+    conn = sqlite3.connect(db_file)
     try:
-        conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
         cursor.execute('SELECT name, due_time, priority FROM tasks WHERE due_date = ? AND completed = 0', (today,))
-        tasks = cursor.fetchall()
+        return cursor.fetchall()
+    finally:
         conn.close()
+
+def view_today_tasks():
+    today = datetime.now().strftime("%Y-%m-%d")
+    try:
+        tasks = [task for partial in fan_out(today_rows, today) for task in partial]
     except sqlite3.Error as e:
         print(f"An error occurred: {e}")
         return
@@ -451,23 +901,96 @@ def view_today_tasks():
     for task in tasks:
         print(f" - {task[0]} (Due: {task[1]}) [Priority: {task[2]}]")
 
-def search_tasks():
-    questions = [
-        {'type': 'input', 'name': 'keyword', 'message': 'Enter keyword to search in task name or description:'},
-        {'type': 'input', 'name': 'tag', 'message': 'Enter tag to search or leave blank:'},
-        {'type': 'confirm', 'name': 'include_completed', 'message': 'Include completed tasks?', 'default': False},
-    ]
-    answers = prompt(questions)
-    keyword = answers['keyword']
-    tag = answers['tag']
-    include_completed = answers['include_completed']
+def agenda_sort_key(row):
+    return row[1], row[2], PRIORITY_RANK.get(row[3], len(PRIORITY_RANK))
 
+def load_agenda_rows(db_file, horizon_str):
+    conn = sqlite3.connect(db_file)
+    try:
+        cursor = conn.cursor()
+        # Served by idx_tasks_pending_due: one range scan, already in due order.
+        cursor.execute('''
+            SELECT name, due_date, due_time, priority, tags
+            FROM tasks
+            WHERE completed = 0 AND due_date <= ?
+            ORDER BY due_date, due_time
+        ''', (horizon_str,))
+        rows = cursor.fetchall()
+    finally:
+        conn.close()
+
+    # Rows arrive sorted by due date/time, so this only reorders priority ties.
+    rows.sort(key=agenda_sort_key)
+    return rows
+
+def get_agenda(days=AGENDA_DAYS):
+    today = datetime.now().date()
+    today_str = today.strftime("%Y-%m-%d")
+    horizon_str = (today + timedelta(days=days)).strftime("%Y-%m-%d")
+
+    cache_key = (today_str, days, tuple(get_db_files()), get_data_versions())
+    if cache_key in _agenda_cache:
+        return _agenda_cache[cache_key]
+
+    rows = heapq.merge(*fan_out(load_agenda_rows, horizon_str), key=agenda_sort_key)
+
+    overdue, today_tasks, upcoming = [], [], defaultdict(list)
+    for row in rows:
+        if row[1] < today_str:
+            overdue.append(row)
+        elif row[1] == today_str:
+            today_tasks.append(row)
+        else:
+            upcoming[row[1]].append(row)
+    # The cached agenda is shared by every caller, so it is built from tuples only.
+    agenda = Agenda(tuple(overdue), tuple(today_tasks), tuple((due_date, tuple(tasks)) for due_date, tasks in upcoming.items()))
+
+    _agenda_cache.clear()
+    _agenda_cache[cache_key] = agenda
+    return agenda
+
+def view_agenda():
+    try:
+        agenda = get_agenda()
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+        return
+
+    if not agenda.overdue and not agenda.today and not agenda.upcoming:
+        print(f"Nothing due in the next {AGENDA_DAYS} days.")
+        return
+
+    def print_task(task, show_date):
+        due_str = f"{task[1]} {task[2]}" if show_date else task[2]
+        print(f" - {task[0]} (Due: {due_str}) [Priority: {task[3]}] [Tags: {task[4]}]")
+
+    if agenda.overdue:
+        print(f"{Fore.RED}Overdue:")
+        for task in agenda.overdue:
+            print_task(task, True)
+
+    print("\nToday:")
+    if agenda.today:
+        for task in agenda.today:
+            print_task(task, False)
+    else:
+        print(" - Nothing due today.")
+
+    for due_date, tasks in agenda.upcoming:
+        day_label = datetime.strptime(due_date, "%Y-%m-%d").strftime("%a %Y-%m-%d")
+        print(f"\n{day_label}:")
+        for task in tasks:
+            print_task(task, False)
+
+def search_rows(db_file, keyword, tag, include_completed, limit=None):
+    # With a limit, name matches rank ahead of description-only matches, then
+    # by due date, so per-shard top-k lists can be merged.
     query = '''
-        SELECT id, name, description, due_date, due_time, priority, tags, completed
+        SELECT name NOT LIKE ? AS rank, due_date, due_time, id, name, description, priority, tags, completed
         FROM tasks
         WHERE (name LIKE ? OR description LIKE ?)
     '''
-    params = [f'%{keyword}%', f'%{keyword}%']
+    params = [f'%{keyword}%', f'%{keyword}%', f'%{keyword}%']
 
     if tag:
         query += ' AND tags LIKE ?'
@@ -476,105 +999,80 @@ def search_tasks():
     if not include_completed:
         query += ' AND completed = 0'
 
+    if limit is not None:
+        query += ' ORDER BY rank, due_date, due_time LIMIT ?'
+        params.append(limit)
+
+    conn = sqlite3.connect(db_file)
     try:
-        conn = sqlite3.connect(DB_FILE)
         cursor = conn.cursor()
         cursor.execute(query, params)
-        results = cursor.fetchall()
+        return [row + (db_file,) for row in cursor.fetchall()]
+    finally:
         conn.close()
-    except sqlite3.Error as e:
-        print(f"An error occurred: {e}")
-        return
 
-    if not results:
-        print("No tasks found.")
-    else:
-        for task in results:
-            status = "Completed" if task[7] else "Pending"
-            print(f"ID: {task[0]}, Name: {task[1]}, Description: {task[2]}, Due: {task[3]} {task[4]}, Priority: {task[5]}, Tags: {task[6]}, Status: {status}")
+def search_tasks():
+    questions = [
+        {'type': 'input', 'name': 'keyword', 'message': 'Enter keyword to search in task name or description:'},
+        {'type': 'input', 'name': 'tag', 'message': 'Enter tag to search or leave blank:'},
+        {'type': 'confirm', 'name': 'include_completed', 'message': 'Include completed tasks?', 'default': False},
+    ]
+    answers = prompt(questions)
+    keyword = answers['keyword']
+    tag = answers['tag']
+    include_completed = answers['include_completed']
 
-def generate_completion_graph():
+    shards = get_shards()
+    sharded = len(shards) > 1
     try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        cursor.execute('SELECT completed_dates FROM tasks WHERE completed = 1')
-        completed_dates = cursor.fetchall()
-        conn.close()
+        partials = fan_out(search_rows, keyword, tag, include_completed, SEARCH_LIMIT + 1 if sharded else None)
     except sqlite3.Error as e:
         print(f"An error occurred: {e}")
         return
 
-    date_counts = defaultdict(int)
-    for dates in completed_dates:
-        for date_str in dates[0].split(','):
-            date = datetime.strptime(date_str.strip(), "%Y-%m-%d %I:%M %p")
-            date_counts[date] += 1
+    if sharded:
+        # Each shard returns its own top matches in rank order; merging them
+        # keeps the global top SEARCH_LIMIT without sorting everything again.
+        results = list(islice(heapq.merge(*partials, key=lambda row: row[:3]), SEARCH_LIMIT + 1))
+        teams = {db_file: team for team, db_file in shards.items()}
+    else:
+        results = partials[0]
+        teams = {}
 
-    range_options = [
-        'Today',
-        'This Week',
-        'This Month',
-        'This Year',
-        'Custom Date Range'
-    ]
+    if not results:
+        print("No tasks found.")
+    else:
+        for task in results[:SEARCH_LIMIT] if sharded else results:
+            status = "Completed" if task[8] else "Pending"
+            team_str = f"Team: {teams[task[9]]}, " if task[9] in teams else ""
+            print(f"{team_str}ID: {task[3]}, Name: {task[4]}, Description: {task[5]}, Due: {task[1]} {task[2]}, Priority: {task[6]}, Tags: {task[7]}, Status: {status}")
+        if sharded and len(results) > SEARCH_LIMIT:
+            print(f"Showing the first {SEARCH_LIMIT} matches. Refine the search to see more.")
 
-    range_question = [{'type': 'list', 'name': 'range', 'message': 'Select date range:', 'choices': range_options}]
+def generate_completion_graph():
+    range_question = [{'type': 'list', 'name': 'range', 'message': 'Select date range:', 'choices': list(GRAPH_RANGES)}]
     range_answer = prompt(range_question)['range']
+    range_name = GRAPH_RANGES[range_answer]
 
-    now = datetime.now()
-
-    if range_answer == 'Today':
-        start_date = now.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_date = start_date + timedelta(days=1)
-        label_format = "%H:00"
-        increment = timedelta(hours=1)
-        title = 'Tasks Completed Today (by hour)'
-    elif range_answer == 'This Week':
-        start_date = now - timedelta(days=now.weekday())
-        start_date = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
-        end_date = start_date + timedelta(days=7)
-        label_format = "%a"
-        increment = timedelta(days=1)
-        title = 'Tasks Completed This Week'
-    elif range_answer == 'This Month':
-        start_date = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        end_date = (start_date + timedelta(days=32)).replace(day=1)
-        label_format = "%d"
-        increment = timedelta(days=1)
-        title = 'Tasks Completed This Month'
-    elif range_answer == 'This Year':
-        start_date = now.replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
-        end_date = start_date.replace(year=start_date.year + 1)
-        label_format = "%b"
-        increment = timedelta(days=30)
-        title = 'Tasks Completed This Year'
-    else:
+    custom_start = custom_end = None
+    if range_name == 'custom':
         custom_range_questions = [
             {'type': 'input', 'name': 'start_date', 'message': 'Enter start date (YYYY-MM-DD):'},
             {'type': 'input', 'name': 'end_date', 'message': 'Enter end date (YYYY-MM-DD):'}
         ]
         custom_range = prompt(custom_range_questions)
-        start_date = datetime.strptime(custom_range['start_date'], "%Y-%m-%d")
-        end_date = datetime.strptime(custom_range['end_date'], "%Y-%m-%d") + timedelta(days=1)
-        
-        if (end_date - start_date).days <= 7:
-            label_format = "%a"
-            increment = timedelta(days=1)
-        elif (end_date - start_date).days <= 31:
-            label_format = "%d"
-            increment = timedelta(days=1)
-        else:
-            label_format = "%b"
-            increment = timedelta(days=30)
-        
-        title = f'Tasks Completed from {start_date.date()} to {end_date.date() - timedelta(days=1)}'
+        custom_start = custom_range['start_date']
+        custom_end = custom_range['end_date']
 
-    graph_data = []
-    current_date = start_date
-    while current_date < end_date:
-        count = sum(1 for d in date_counts if current_date <= d < current_date + increment)
-        graph_data.append((current_date, count))
-        current_date += increment
+    start_date, end_date, label_format, increment, title = get_graph_range(range_name, custom_start, custom_end)
+
+    try:
+        date_counts = get_completion_counts()
+    except sqlite3.Error as e:
+        print(f"An error occurred: {e}")
+        return
+
+    graph_data = bucket_completions(date_counts, start_date, end_date, increment)
 
     max_count = max(count for _, count in graph_data) if graph_data else 0
     
@@ -603,20 +1101,7 @@ def generate_completion_graph():
 
 def settings():
     current_settings = load_settings()
-    
-    all_menu_items = [
-        'Add a task',
-        'Complete a task',
-        'Edit a task',
-        'List all tasks',
-        'View tasks due today',
-        'Search tasks',
-        'Show task statistics',
-        'Generate completion graph',
-        'Remove completed tasks',
-        'Export tasks',
-        'Import tasks'
-    ]
+    all_menu_items = get_default_menu_items()
     
     setting_questions = [
         {
@@ -634,6 +1119,7 @@ def settings():
     ]
     
     new_settings = prompt(setting_questions)
+    new_settings['known_menu_items'] = all_menu_items
     save_settings(new_settings)
     print("Settings updated successfully.")
 
@@ -643,16 +1129,17 @@ def export_tasks():
     ]
     answers = prompt(questions)
     export_format = answers['format']
+    db_file = select_db_file('Select team to export:')
 
-    conn = sqlite3.connect(DB_FILE)
+    conn = sqlite3.connect(db_file)
     cursor = conn.cursor()
-    cursor.execute('SELECT name, description, due_date, due_time, priority, tags, completed, repeatable, repeat_interval, completed_dates FROM tasks')
+    cursor.execute('SELECT name, description, due_date, due_time, priority, tags, completed, repeatable, repeat_interval, completed_dates, external_id FROM tasks')
     tasks = cursor.fetchall()
     conn.close()
 
     if export_format == 'CSV':
         with open('tasks_export.csv', 'w', newline='') as csvfile:
-            fieldnames = ['Name', 'Description', 'Due Date', 'Due Time', 'Priority', 'Tags', 'Completed', 'Repeatable', 'Repeat Interval', 'Completed Dates']
+            fieldnames = ['Name', 'Description', 'Due Date', 'Due Time', 'Priority', 'Tags', 'Completed', 'Repeatable', 'Repeat Interval', 'Completed Dates', 'External ID']
             writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
             writer.writeheader()
             for task in tasks:
@@ -666,7 +1153,8 @@ def export_tasks():
                     'Completed': task[6],
                     'Repeatable': task[7],
                     'Repeat Interval': task[8],
-                    'Completed Dates': task[9]
+                    'Completed Dates': task[9],
+                    'External ID': task[10]
                 })
     elif export_format == 'JSON':
         with open('tasks_export.json', 'w') as jsonfile:
@@ -682,33 +1170,146 @@ def export_tasks():
                     'Completed': task[6],
                     'Repeatable': task[7],
                     'Repeat Interval': task[8],
-                    'Completed Dates': task[9]
+                    'Completed Dates': task[9],
+                    'External ID': task[10]
                 })
             json.dump(task_list, jsonfile, indent=4)
     print(f'Tasks exported to tasks_export.{export_format.lower()}.')
 
+def derive_external_id(name, due_date, due_time):
+    # Feeds without an External ID column are keyed on what identifies a task,
+    # so re-importing the same row always maps to the same stored task.
+    return hashlib.sha1(f"{name}\x1f{due_date}\x1f{due_time}".encode()).hexdigest()
+
+@lru_cache(maxsize=65536)
+def matches_format(value, date_format):
+    # Feeds repeat the same dates and times heavily, so each distinct string
+    # is only run through strptime once per process.
+    try:
+        datetime.strptime(value, date_format)
+        return True
+    except ValueError:
+        return False
+
+def validate_import_row(row_number, row):
+    name = row['Name']
+    due_date, due_time = row['Due Date'], row['Due Time']
+    if not (matches_format(due_date, "%Y-%m-%d") and matches_format(due_time, "%H:%M")):
+        raise ValueError(f"row {row_number} ('{name}'): invalid due date or time '{due_date} {due_time}'")
+
+    completed = int(row.get('Completed') or 0)
+    completed_dates = row.get('Completed Dates') or ''
+    completion_strs = [date_str.strip() for date_str in completed_dates.split(',') if date_str.strip()]
+    if completed and not completion_strs:
+        raise ValueError(f"row {row_number} ('{name}'): completed task has no completion dates")
+    for date_str in completion_strs:
+        if not matches_format(date_str, "%Y-%m-%d %I:%M %p"):
+            raise ValueError(f"row {row_number} ('{name}'): invalid completion date '{date_str}'")
+
+def import_rows(db_file, rows):
+    def task_values():
+        for row_number, row in enumerate(rows, start=1):
+            validate_import_row(row_number, row)
+            external_id = row.get('External ID') or derive_external_id(row['Name'], row['Due Date'], row['Due Time'])
+            yield (row_number, row['Name'], row.get('Description'), row['Due Date'], row['Due Time'], row['Priority'], row.get('Tags') or '',
+                   int(row.get('Completed') or 0), int(row.get('Repeatable') or 0), row.get('Repeat Interval') or None,
+                   row.get('Completed Dates') or '', external_id)
+
+    conn = sqlite3.connect(db_file)
+    try:
+        cursor = conn.cursor()
+        # Stage the feed first so duplicate keys inside it can be found with
+        # one indexed query before anything touches the tasks table.
+        cursor.execute('''
+            CREATE TEMP TABLE import_batch (
+                row_number INTEGER PRIMARY KEY,
+                name TEXT, description TEXT, due_date TEXT, due_time TEXT, priority TEXT, tags TEXT,
+                completed INTEGER, repeatable INTEGER, repeat_interval TEXT, completed_dates TEXT, external_id TEXT
+            )
+        ''')
+        cursor.executemany('INSERT INTO import_batch VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', task_values())
+        cursor.execute('CREATE INDEX temp.idx_import_batch_external_id ON import_batch (external_id, row_number)')
+        cursor.execute('SELECT COUNT(*) FROM import_batch')
+        processed = cursor.fetchone()[0]
+
+        # Later rows that repeat an earlier row's key are skipped and reported,
+        # never merged into the first one.
+        cursor.execute('''
+            SELECT row_number, name FROM import_batch AS later
+            WHERE EXISTS (
+                SELECT 1 FROM import_batch AS earlier
+                WHERE earlier.external_id = later.external_id AND earlier.row_number < later.row_number
+            )
+            ORDER BY row_number
+        ''')
+        duplicates = cursor.fetchall()
+
+        cursor.execute('SELECT COUNT(*) FROM tasks')
+        count_before = cursor.fetchone()[0]
+        # The WHERE on DO UPDATE skips rows whose content already matches, so
+        # rowcount only includes inserted and actually changed tasks.
+        cursor.execute('''
+            INSERT INTO tasks (name, description, due_date, due_time, priority, tags, completed, repeatable, repeat_interval, completed_dates, external_id)
+            SELECT name, description, due_date, due_time, priority, tags, completed, repeatable, repeat_interval, completed_dates, external_id
+            FROM import_batch AS later
+            WHERE NOT EXISTS (
+                SELECT 1 FROM import_batch AS earlier
+                WHERE earlier.external_id = later.external_id AND earlier.row_number < later.row_number
+            )
+            ON CONFLICT (external_id) DO UPDATE SET
+                name = excluded.name,
+                description = excluded.description,
+                due_date = excluded.due_date,
+                due_time = excluded.due_time,
+                priority = excluded.priority,
+                tags = excluded.tags,
+                completed = excluded.completed,
+                repeatable = excluded.repeatable,
+                repeat_interval = excluded.repeat_interval,
+                completed_dates = excluded.completed_dates
+            WHERE tasks.name IS NOT excluded.name
+                OR tasks.description IS NOT excluded.description
+                OR tasks.due_date IS NOT excluded.due_date
+                OR tasks.due_time IS NOT excluded.due_time
+                OR tasks.priority IS NOT excluded.priority
+                OR tasks.tags IS NOT excluded.tags
+                OR tasks.completed IS NOT excluded.completed
+                OR tasks.repeatable IS NOT excluded.repeatable
+                OR tasks.repeat_interval IS NOT excluded.repeat_interval
+                OR tasks.completed_dates IS NOT excluded.completed_dates
+        ''')
+        changed = cursor.rowcount
+        cursor.execute('SELECT COUNT(*) FROM tasks')
+        inserted = cursor.fetchone()[0] - count_before
+        if changed:
+            bump_data_version(cursor)
+        conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        'inserted': inserted,
+        'updated': changed - inserted,
+        'unchanged': processed - len(duplicates) - changed,
+        'duplicates': duplicates
+    }
+
 def import_tasks():
     filename = input("Enter the filename to import tasks from (e.g., tasks.csv): ")
+    db_file = select_db_file('Select team to import into:')
     try:
-        with open(filename, 'r') as csvfile:
-            reader = csv.reader(csvfile)
-            headers = next(reader)
-            
-            conn = sqlite3.connect(DB_FILE)
-            cursor = conn.cursor()
-            
-            for row in reader:
-                cursor.execute('''
-                    INSERT INTO tasks (name, due_date, due_time, priority, tags, completed, repeatable, repeat_interval, completed_dates)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (row[1], row[2], row[3], row[4], row[5], int(row[6]), int(row[7]), row[8], row[9]))
-            
-            conn.commit()
-            conn.close()
-            print(f"Tasks imported successfully from {filename}")
+        with open(filename, 'r', newline='') as csvfile:
+            counts = import_rows(db_file, csv.DictReader(csvfile))
+        print(f"Tasks imported successfully from {filename}: {counts['inserted']} inserted, {counts['updated']} updated, {counts['unchanged']} unchanged.")
+        if counts['duplicates']:
+            print(f"Skipped {len(counts['duplicates'])} rows that repeat an earlier row's External ID (or name, due date and time):")
+            for row_number, name in counts['duplicates'][:10]:
+                print(f" - row {row_number}: {name}")
     except FileNotFoundError:
         print(f"File {filename} not found.")
-    except csv.Error as e:
+    except KeyError as e:
+        print(f"Error reading CSV file: missing column {e}")
+    except (csv.Error, ValueError) as e:
         print(f"Error reading CSV file: {e}")
     except sqlite3.Error as e:
         print(f"Error inserting data into database: {e}")
@@ -718,8 +1319,10 @@ def get_default_menu_items():
         'Add a task',
         'Complete a task',
         'Edit a task',
+        'Bulk edit tasks',
         'List all tasks',
         'View tasks due today',
+        'View agenda',
         'Search tasks',
         'Show task statistics',
         'Generate completion graph',
@@ -732,8 +1335,14 @@ def load_settings():
     try:
         with open('settings.json', 'r') as f:
             settings = json.load(f)
+            default_menu_items = get_default_menu_items()
             if 'menu_items' not in settings:
-                settings['menu_items'] = get_default_menu_items()
+                settings['menu_items'] = default_menu_items
+            known_menu_items = settings.get('known_menu_items', [item for item in default_menu_items if item not in NEW_MENU_ITEMS])
+            added_items = [item for item in default_menu_items if item not in known_menu_items]
+            if added_items:
+                enabled_items = set(settings['menu_items']) | set(added_items)
+                settings['menu_items'] = [item for item in default_menu_items if item in enabled_items]
             return settings
     except FileNotFoundError:
         return {'menu_items': get_default_menu_items()}
@@ -759,10 +1368,14 @@ def main():
             complete_task()
         elif choice == 'Edit a task':
             edit_task()
+        elif choice == 'Bulk edit tasks':
+            bulk_edit_tasks()
         elif choice == 'List all tasks':
             list_tasks()
         elif choice == 'View tasks due today':
             view_today_tasks()
+        elif choice == 'View agenda':
+            view_agenda()
         elif choice == 'Search tasks':
             search_tasks()
         elif choice == 'Show task statistics':
@@ -781,10 +1394,77 @@ def main():
             break
         time.sleep(2)
 
-notification_thread = threading.Thread(target=check_upcoming_tasks, daemon=True)
-notification_thread.start()
+def chart_command(args):
+    init_db()
+    if args.range == 'custom' and not (args.start and args.end):
+        print("--start and --end are required for a custom range.")
+        return 1
+    try:
+        print(render_completion_chart(args.range, args.format, args.start, args.end))
+    except (sqlite3.Error, ValueError, OSError) as e:
+        print(f"An error occurred: {e}")
+        return 1
+    return 0
+
+def shard_command(args):
+    shards = load_shards()
+    if args.shard_command == 'add':
+        if args.team == DEFAULT_TEAM:
+            print(f"'{DEFAULT_TEAM}' is reserved for {DB_FILE}. Register {DB_FILE} under a team name to rename it.")
+            return 1
+        # Two teams on one file would make every fan-out read count it twice.
+        for team, path in shards.items():
+            if team != args.team and os.path.abspath(path) == os.path.abspath(args.path):
+                print(f"{args.path} is already registered for team '{team}'.")
+                return 1
+        try:
+            init_db_file(args.path)
+        except sqlite3.Error as e:
+            print(f"An error occurred: {e}")
+            return 1
+        shards[args.team] = args.path
+        save_shards(shards)
+        print(f"Team '{args.team}' now stores its tasks in {args.path}.")
+    elif args.shard_command == 'remove':
+        if shards.pop(args.team, None) is None:
+            print(f"Team '{args.team}' is not registered.")
+            return 1
+        save_shards(shards)
+        print(f"Team '{args.team}' removed. Its database file was left in place.")
+    elif not shards:
+        print(f"No teams registered. All tasks are stored in {DB_FILE}.")
+    else:
+        for team, path in sorted(get_shards().items()):
+            print(f"{team}: {path}")
+    return 0
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Task Reminder CLI Tool')
+    subparsers = parser.add_subparsers(dest='command')
+    chart_parser = subparsers.add_parser('chart', help='Render the completion chart to an image file and print its path')
+    chart_parser.add_argument('--range', choices=list(GRAPH_RANGES.values()), default='week')
+    chart_parser.add_argument('--format', choices=['png', 'svg'], default='png')
+    chart_parser.add_argument('--start', help='Start date (YYYY-MM-DD) for a custom range')
+    chart_parser.add_argument('--end', help='End date (YYYY-MM-DD) for a custom range')
+    shard_parser = subparsers.add_parser('shard', help='Manage per-team task databases')
+    shard_subparsers = shard_parser.add_subparsers(dest='shard_command')
+    shard_add_parser = shard_subparsers.add_parser('add', help='Register a team and the database file that stores its tasks')
+    shard_add_parser.add_argument('team')
+    shard_add_parser.add_argument('path')
+    shard_remove_parser = shard_subparsers.add_parser('remove', help='Unregister a team')
+    shard_remove_parser.add_argument('team')
+    shard_subparsers.add_parser('list', help='List registered teams')
+    return parser.parse_args()
 
 if __name__ == '__main__':
+    args = parse_args()
+    if args.command == 'chart':
+        raise SystemExit(chart_command(args))
+    if args.command == 'shard':
+        raise SystemExit(shard_command(args))
+
+    notification_thread = threading.Thread(target=check_upcoming_tasks, daemon=True)
+    notification_thread.start()
     try:
         init_db()
         main()